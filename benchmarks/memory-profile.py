@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import fitz
+
+# memory profile of check-amm.py in low memory mode
+# generates synthetic SIs with an increasing number of pages, checks each of them in a fresh process and
+# compares the growth of the peak RSS between the smallest and the largest SI
+# mupdf needs memory in the size of the pdf (xref table, page tree) just to open it, so the peak RSS of opening
+# the pdf (after importing check_amm, so the interpreter starts from the same state) is subtracted first
+# fails if low memory mode grows by more than growth_limit, or if default mode does not (then the page counts are
+# too small to tell the modes apart)
+#
+# when you run the benchmark, python benchmarks/memory-profile.py [page counts ...]
+# e.g. python benchmarks/memory-profile.py 50 400 1500
+
+package_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+script = os.path.join(package_dir, 'check-amm.py')
+page_counts = [int(arg) for arg in sys.argv[1:]] or [50, 400, 1500]
+growth_limit = 3.0 # MB between the smallest and the largest SI
+
+open_script = "import sys; sys.path.insert(0, sys.argv[2]); import check_amm, fitz; pdf_document = fitz.open(sys.argv[1]); pdf_document.load_page(pdf_document.page_count - 1)"
+
+hrms_lines = [
+    "HRMS (ESI) m/z: [M+H]+ calcd for C21H19O4 319.1329; found 319.1333.",
+    "HRMS (ESI) m/z: [M+H]+ calcd for C21H19O3 303.1380; found 303.1377.",
+    "HRMS (ESI) m/z: [M+H]+ calcd for C10H13N2O 177.1022; found 177.1029.",
+]
+filler = "The mixture was stirred at room temperature for 2 h and concentrated under reduced pressure."
+
+# synthetic SI with one compound characterization per page
+def writeSI(filepath, page_count):
+    pdf_document = fitz.open()
+    for page_num in range(page_count):
+        page = pdf_document.new_page()
+        y = 72
+        for i in range(20):
+            page.insert_text((72, y), filler, fontsize=8)
+            y += 12
+        page.insert_text((72, y), hrms_lines[page_num % len(hrms_lines)], fontsize=8)
+    pdf_document.save(filepath)
+    pdf_document.close()
+
+# Input:
+#     - command to run
+# Return:
+#     - peak RSS of the command in MB
+def peakRSS(command):
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    pid, status, rusage = os.wait4(process.pid, 0)
+    if status != 0:
+        raise RuntimeError(f"{command[1]} exited with status {status}")
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss / 1024 ** 2 # bytes
+    return rusage.ru_maxrss / 1024 # kB
+
+
+with tempfile.TemporaryDirectory() as tmpdir:
+    results = {}
+    for page_count in page_counts:
+        filepath = os.path.join(tmpdir, f'si_{page_count}.pdf')
+        outfile = os.path.join(tmpdir, f'out_{page_count}.json')
+        writeSI(filepath, page_count)
+        command = [sys.executable, script, '3', '1', outfile, '0', filepath]
+        results[page_count] = {
+            "open": peakRSS([sys.executable, '-c', open_script, filepath, package_dir]),
+            "default": peakRSS(command),
+            "low memory": peakRSS(command + ['--low-memory']),
+        }
+
+print(f"{'pages':>8} {'open (MB)':>10} {'default (MB)':>14} {'low memory (MB)':>16}")
+for page_count, result in results.items():
+    print(f"{page_count:>8} {result['open']:>10.1f} {result['default']:>14.1f} {result['low memory']:>16.1f}")
+
+smallest = results[min(page_counts)]
+largest = results[max(page_counts)]
+growth = {mode: round((largest[mode] - largest['open']) - (smallest[mode] - smallest['open']), 1)
+          for mode in ("default", "low memory")}
+print(json.dumps({"growth (MB)": growth, "growth limit (MB)": growth_limit}))
+if growth["low memory"] > growth_limit:
+    print("low memory mode is not flat")
+    sys.exit(1)
+if growth["default"] <= growth_limit:
+    print("default mode is flat too, use more pages")
+    sys.exit(1)
@@ -0,0 +1,1660 @@
+from molmass import Formula, FormulaError, ELECTRON
+import os
+import re
+import fitz
+from fpdf import FPDF
+
+import sys
+import math
+import json
+import mmap
+import time
+import zlib
+import struct
+import sqlite3
+import pickle
+import hashlib
+import itertools
+import tempfile
+import textwrap
+import string
+import asyncio
+import collections
+import contextlib
+import threading
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+try:
+    import fcntl
+except ImportError: # windows
+    fcntl = None
+    import msvcrt
+
+def calculateError(found_mass_from_si, calculated_mass):
+    return abs(round((calculated_mass / found_mass_from_si - 1) * 10 ** 6, 1))
+
+def setErrorLevel(error_level, new_level):
+    if error_level < new_level:
+        return new_level   
+    else:
+        return error_level
+
+# SI -- calculated and reported masses differ in their integers
+# Input:
+#     - calculated mass from si
+#     - found mass from si
+# Return: 
+#     - True = there is a different integer
+#     - False = otherwise    
+def checkDifferentIntegers(calculated_mass_from_si, found_mass_from_si):
+
+    calculated_mass_from_si_str = str(int(calculated_mass_from_si))
+    found_mass_from_si_str = str(int(found_mass_from_si))
+
+    typo_si = False
+    for char1, char2 in zip(calculated_mass_from_si_str, found_mass_from_si_str):
+        if char1 == '.' or char2 == '.':
+            break
+        if char1 != char2:
+            return True
+    return False
+
+# Input:
+#     - calculated mass from si
+#     - found mass from si
+# Return: 
+#     - True = there are swapped integers excluding the last two digits
+#     - False = otherwise    
+
+def checkSwappedIntegers(calculated_mass_from_si, found_mass_from_si):
+    # Convert both numbers to strings (excluding the last character)
+    str_num1 = str(calculated_mass_from_si)[:-1]
+    str_num2 = str(found_mass_from_si)[:-1]
+
+    # If lengths of the numbers are different, return False
+    if len(str_num1) != len(str_num2):
+        return False
+
+    # Find mismatched positions and check for a valid swap
+    mismatches = []
+    for i in range(len(str_num1)):
+        if str_num1[i] != str_num2[i]:
+            mismatches.append(i)
+            # If there are exactly 2 mismatches, check for a valid swap
+            if len(mismatches) == 2:
+                i, j = mismatches
+                if str_num1[i] == str_num2[j] and str_num1[j] == str_num2[i]:
+                    return True
+            # If more than 2 mismatches, it's not a valid swap
+            elif len(mismatches) > 2:
+                return False
+
+    # If we finish the loop without finding exactly 2 mismatches, return False
+    return False
+
+
+# typo in calculated and/or measurement / either differ from the calculated mass by one digit
+# last character must be the same or will reject
+# Input:
+#     - calculated mass from si
+#     - found mass from si
+#     - calculated mass from neutral/cation/anion
+# Return: 
+#     - 0 = not a typo problem
+#     - 1 = typo with calculated from si only
+#     - 2 = typo with found from si only
+#     - 3 = typo with both calculated from si and found from si   
+def checkTypo(calculated_mass_from_si, found_mass_from_si, calculated_mass):
+    calculated_mass_from_si_str = "{:.4f}".format(calculated_mass_from_si)[-4:-2]
+    found_mass_from_si_str = "{:.4f}".format(found_mass_from_si)[-4:-2]
+    calculated_mass_str = "{:.4f}".format(calculated_mass)[-4:-2]
+
+    typo_si = False
+    for char1, char2 in zip(calculated_mass_from_si_str, found_mass_from_si_str):
+        if char1 != char2:
+            if typo_si:
+                typo_si = False
+                break
+            else:
+                typo_si = True
+    
+    typo_calculated = False
+
+    return typo_si or typo_calculated
+
+# check if the mass of the added ion was wrongly added to the neutral molecule
+# output:
+#   0 = not because of the ion + neutral mass
+#   1 = neutral + assumed mass = calculated mass from si
+#   2 = neutral - actual mass + assumed mass = calculated mass from si
+def checkIon(molecular_formula, calculated_mass_from_si, calculated_mass_from_neutral, added_ion, assumed_mass):
+    # check if the ion is in the molecular formula
+    elements = Formula(added_ion).composition()
+    composition = Formula(molecular_formula).composition()
+    for curr_element, content in elements.items():
+        if curr_element != 'e-':
+            if curr_element not in composition:
+                return 0
+            if content.count < elements[curr_element].count:
+                return 0
+    # neutral + assumed mass
+    if calculated_mass_from_neutral + assumed_mass == calculated_mass_from_si:
+        return 1
+    
+    # neutral - actual mass of added ion + assumed mass    
+    if float("{:.4f}".format(calculated_mass_from_neutral - Formula(added_ion).monoisotopic_mass + assumed_mass)) == calculated_mass_from_si:
+        return 2
+
+# Input:
+#     - molecular formula
+#     - calculated mass from si
+#     - found mass from si
+#     - element to add
+#     - upper range for how many of 'element to add' to add
+# Return: 
+#     - number of element(s) to add s.t. the new mass with the addition == calculated mass from si
+def checkAddition(molecular_formula, calculated_mass_from_si, element_to_add, upper_range):
+    calculated_mass = Formula(molecular_formula).monoisotopic_mass
+
+    for i in range(upper_range+1):
+        new_calculated_mass = float("{:.4f}".format(calculated_mass + (i) * Formula(element_to_add).monoisotopic_mass))
+        if new_calculated_mass == calculated_mass_from_si:
+            return i
+
+    return 0
+
+# Input:
+#     - molecular formula
+#     - calculated mass from si
+#     - found mass from si
+#     - element to remove
+#     - upper range for how many of 'element to remove' to remove
+# Return: 
+#     - number of element(s) to remove s.t. the new mass with the addition == calculated mass from si
+def checkRemove(molecular_formula, calculated_mass_from_si, element_to_remove, upper_range):
+    calculated_mass = Formula(molecular_formula).monoisotopic_mass
+    
+    # check if element_to_remove is in molecular formula. element_to_remove could be 1 or more elements
+    elements = Formula(element_to_remove).composition()
+    composition = Formula(molecular_formula).composition()
+    for curr_element, content in elements.items():
+        if curr_element != 'e-':
+            if curr_element not in composition:
+                return 0
+            else:
+                if composition[curr_element].count < content.count * upper_range:
+                    upper_range = math.floor(composition[curr_element].count / content.count)
+
+    for i in range(upper_range+1):
+        new_calculated_mass = float("{:.4f}".format(calculated_mass - (i) * Formula(element_to_remove).monoisotopic_mass))
+        if new_calculated_mass == calculated_mass_from_si:
+            return i
+
+    return 0
+
+def checkReplace(molecular_formula, calculated_mass_from_si, element_to_remove, element_to_add):
+    calculated_mass = Formula(molecular_formula).monoisotopic_mass
+    composition = Formula(molecular_formula).composition()
+
+    if element_to_remove in composition:
+        new_calculated_mass = float("{:.4f}".format(calculated_mass - Formula(element_to_remove).monoisotopic_mass + Formula(element_to_add).monoisotopic_mass))
+        return new_calculated_mass == calculated_mass_from_si
+    else:
+        return False
+
+# composition -> molecular formula
+def compositionToFormula(composition, measuring_mode):
+    formula_str = []
+    for element in composition:
+        if element != 'e-':
+            if composition[element]['count'] != 0:
+                if composition[element]['count'] == 1:
+                    formula_str.append(f'{element}')
+                else:
+                    formula_str.append(f"{element}{composition[element]['count']}")
+    molecular_formula_neutral = '['+''.join(formula_str)+']'
+    if measuring_mode == "cation":
+        return molecular_formula_neutral+"+"
+    elif measuring_mode == "anion":
+        return molecular_formula_neutral+"-"
+    else:
+        return molecular_formula_neutral
+
+def compositionToDict(composition):
+    return {element: {"count": content.count} for element, content in composition.items()}
+
+
+# formula cache: formula -> (monoisotopic mass, average mass, composition)
+# every process keeps a local dictionary, and optionally shares a memory-mapped file with the other processes,
+# so adding workers does not multiply the parsing of the formulas (the os shares the pages of the file)
+# the file is an open-addressing hash table with a single writer: the process that warms it (see warmFormulaCache)
+# writes new formulas, the workers only read it (see openFormulaCache)
+# creating, warming and saving hold an exclusive lock on <path>.lock, so two processes that warm the same file
+# (e.g. two check-amm.py runs with the same --formula-cache) write it one after the other
+formula_cache = {}
+formula_cache_lock = threading.Lock() # checkFiles runs several checks in threads
+formula_cache_size = 100000
+formula_cache_slots = 65536
+formula_cache_probes = 32
+formula_cache_magic = b'AMMFC001'
+formula_cache_groups = ['H', 'D', 'Li', 'B', 'C', 'N', 'O', 'F', 'Na', 'Si', 'P', 'S', 'Cl', 'K', 'Br', 'I',
+                        'CH2', 'CH3', 'CH4', 'OH', 'H2O', 'H3O', 'NH', 'NH2', 'NH3', 'NH4', 'CH3COO'] # warmed at startup
+formula_cache_header = struct.Struct('<8sI') # magic, number of slots
+formula_cache_slot = struct.Struct('<48sdd64s') # formula, monoisotopic mass, average mass, composition
+shared_formula_cache = None
+
+# composition <-> bytes stored in the shared file, e.g. b'C=21;H=19;O=3;e-=-1'
+def encodeComposition(composition):
+    return ';'.join(f"{element}={count}" for element, count in composition.items()).encode('ascii')
+
+def decodeComposition(data):
+    composition = {}
+    for item in data.rstrip(b'\0').decode('ascii').split(';'):
+        if item:
+            element, count = item.split('=')
+            composition[element] = int(count)
+    return composition
+
+# Return:
+#     - offset of the slot that holds the formula or of the empty slot to write it to, None if the probes are used up
+#     - True = the slot holds the formula
+def findSlot(cache, key):
+    slots = formula_cache_header.unpack_from(cache, 0)[1]
+    index = zlib.crc32(key) % slots
+    for probe in range(formula_cache_probes):
+        offset = formula_cache_header.size + ((index + probe) % slots) * formula_cache_slot.size
+        slot_key = cache[offset:offset + 48].rstrip(b'\0')
+        if slot_key == b'':
+            return offset, False
+        if slot_key == key:
+            return offset, True
+    return None, False
+
+# write a formula to a writable mapping of the shared file
+def writeSlot(cache, formula, data):
+    key = formula.encode('utf-8')
+    composition = encodeComposition(data[2])
+    if len(key) > 48 or len(composition) > 64:
+        return
+    offset, found = findSlot(cache, key)
+    if offset is None or found:
+        return
+    # the key is written last, so readers never see a formula without its data
+    cache[offset + 48:offset + formula_cache_slot.size] = formula_cache_slot.pack(b'', data[0], data[1], composition)[48:]
+    cache[offset:offset + 48] = key.ljust(48, b'\0')
+
+# Input:
+#     - molecular formula
+# Return:
+#     - (monoisotopic mass, average mass, {element: count}), raises FormulaError if the formula is invalid
+def formulaData(formula):
+    data = formula_cache.get(formula)
+    if data is not None:
+        return data
+
+    if shared_formula_cache is not None:
+        key = formula.encode('utf-8')
+        if len(key) <= 48:
+            offset, found = findSlot(shared_formula_cache, key)
+            if found:
+                slot_key, monoisotopic_mass, mass, composition = formula_cache_slot.unpack_from(shared_formula_cache, offset)
+                data = (monoisotopic_mass, mass, decodeComposition(composition))
+
+    if data is None:
+        parsed_formula = Formula(formula)
+        data = (parsed_formula.monoisotopic_mass, parsed_formula.mass,
+                {element: content.count for element, content in parsed_formula.composition().items()})
+
+    with formula_cache_lock:
+        formula_cache[formula] = data
+        if len(formula_cache) > formula_cache_size:
+            del formula_cache[next(iter(formula_cache))]
+    return data
+
+def formulaMonoisotopicMass(formula):
+    return formulaData(formula)[0]
+
+def formulaMass(formula):
+    return formulaData(formula)[1]
+
+# same as compositionToDict(Formula(formula).composition())
+def formulaComposition(formula):
+    return {element: {"count": count} for element, count in formulaData(formula)[2].items()}
+
+# lock on <path>.lock, held while the shared file is created or written (exclusive) or mapped (shared)
+# the lock file is left in place, removing it would let another process lock a new file with the same name
+@contextlib.contextmanager
+def lockFormulaCache(path, shared=False):
+    with open(path + '.lock', 'a+b') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1) # windows has no shared lock
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# map the shared file read-only in this process, e.g. as the initializer of a ProcessPoolExecutor
+def openFormulaCache(path):
+    with lockFormulaCache(path, shared=True):
+        mapFormulaCache(path)
+
+# create the shared file if needed, write the element groups and formulas to it and map it in this process
+# Input:
+#     - path of the shared file
+#     - (optional) formulas to warm the cache with
+def warmFormulaCache(path, formulas=()):
+    with lockFormulaCache(path):
+        if not os.path.exists(path):
+            with open(path, 'wb') as cache_file:
+                cache_file.write(formula_cache_header.pack(formula_cache_magic, formula_cache_slots))
+                cache_file.truncate(formula_cache_header.size + formula_cache_slots * formula_cache_slot.size)
+        for formula in list(formula_cache_groups) + list(formulas):
+            try:
+                formulaData(formula)
+            except ValueError:
+                pass
+        writeFormulaCache(path)
+        mapFormulaCache(path)
+
+# write the formulas parsed by this process to the shared file (only from the process that warmed it)
+def saveFormulaCache(path):
+    with lockFormulaCache(path):
+        writeFormulaCache(path)
+
+# the following two expect the lock to be held by the caller
+def mapFormulaCache(path):
+    global shared_formula_cache
+    with open(path, 'rb') as cache_file:
+        cache = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, slots = formula_cache_header.unpack_from(cache, 0)
+    if magic != formula_cache_magic or len(cache) != formula_cache_header.size + slots * formula_cache_slot.size:
+        cache.close()
+        raise ValueError(f"{path} is not a formula cache")
+    shared_formula_cache = cache
+
+def writeFormulaCache(path):
+    with open(path, 'r+b') as cache_file:
+        cache = mmap.mmap(cache_file.fileno(), 0)
+        with formula_cache_lock:
+            entries = list(formula_cache.items())
+        for formula, data in entries:
+            writeSlot(cache, formula, data)
+        cache.flush()
+        cache.close()
+
+# classification rules
+# every rule receives the precomputed inputs of a row together with the current comment and error level
+# Return:
+#     - None = the rule does not apply to the row
+#     - (comment, error level) = otherwise
+
+def ruleInvalidFormula(inputs, comment, errlvl):
+    if isinstance(inputs['measuring mode'], int) and inputs['measuring mode'] == -1:
+        return f"Invalid molecular formula. Check for capitalizations, notations (i.e. 0's mistaken for O's), or any other typographical errors. ", "B"
+
+def ruleInvalidInput(inputs, comment, errlvl):
+    if isinstance(inputs['measuring mode'], str) and inputs['measuring mode'] == 'N/A':
+        return f"The SI provided could not be processed due to unexpected inputs. ", errlvl
+
+def ruleWithinThreshold(inputs, comment, errlvl):
+    if not (inputs['mass error'] >= inputs['threshold'] or inputs['mass error from si'] >= inputs['threshold'] or inputs['measuring mode'] == 'neutral' or inputs['molecular ion type'] == 'unknown'):
+        return comment, errlvl
+
+def ruleImplausibleFormula(inputs, comment, errlvl):
+    if inputs['mass error'] > 100 or inputs['mass error from si'] > 100:
+        for element, content in inputs['composition'].items():
+            if content['count'] >= 100 or 'I' in element or 'l' in element:
+                return "Potential invalid molecular formula. Check for capitalizations, notations (i.e. 0's mistaken for O's), or any other typographical errors. ", "B"
+
+def ruleNeutralMass(inputs, comment, errlvl):
+    if inputs['measuring mode'] == 'neutral':
+        if not inputs['neutral']:
+            return comment + "The reported mass was calculated not taking into account the mass of the electron. ", "F"
+        elif inputs['neutral']:
+            return comment + "Above selected threshold. ", "G"
+
+def ruleMolecularWeightNeutral(inputs, comment, errlvl):
+    if inputs['calculated mass from si'] == inputs['molecular weight neutral']:
+        return comment + f"The molecular weight ({inputs['molecular weight neutral']}) was calculated, not the accurate mass ({inputs['calculated mass']}). ", "C"
+
+def ruleMolecularWeightIon(inputs, comment, errlvl):
+    if inputs['calculated mass from si'] == inputs['molecular weight ion']:
+        return comment + f"The molecular weight ({inputs['molecular weight ion']}) was calculated, not the accurate mass ({inputs['calculated mass']}). ", "C"
+
+# check whether the mass of the ion (H, Na, K) was added to the neutral molecule as a whole number,
+# for neutral-actualmass, neutral, mw_neutral-actualmass, mw_neutral
+def ruleAddedIon(element):
+    assumed_mass, monoisotopic_mass, average_mass = ions_to_check[element]
+
+    def rule(inputs, comment, errlvl):
+        composition = inputs['composition']
+        calculated_mass_from_si = inputs['calculated mass from si']
+
+        neutral_assumed = float("{:.4f}".format(inputs['calculated mass from neutral'] + assumed_mass))
+        if neutral_assumed == calculated_mass_from_si:
+            return comment + f"It appears that the accurate mass was generated by calculating the accurate mass for the neutral molecule {inputs['molecular formula neutral']} ({inputs['calculated mass from neutral']}) and adding +{assumed_mass}.0000 => {neutral_assumed}. ", "E"
+
+        if element in composition:
+            neutral_actual_assumed = float("{:.4f}".format(inputs['calculated mass from neutral'] - monoisotopic_mass + assumed_mass))
+            if neutral_actual_assumed == calculated_mass_from_si:
+                molecular_formula_removed = removeElement(composition, element)
+                return comment + f"It appears that the accurate mass was generated by calculating the accurate mass for the neutral molecule {molecular_formula_removed} ({formulaMonoisotopicMass(molecular_formula_removed):.4f}) and adding +{assumed_mass:.4f} => {inputs['molecular formula neutral']} ({neutral_actual_assumed}). ", "E"
+
+        mw_assumed = float("{:.4f}".format(inputs['molecular weight neutral'] + assumed_mass))
+        if mw_assumed == calculated_mass_from_si:
+            return comment + f"It appears that the accurate mass was generated by calculating the molecular weight for the neutral molecule {inputs['molecular formula neutral']} ({inputs['molecular weight neutral']}) and adding +{assumed_mass}.0000 => {mw_assumed}. ", "C"
+
+        if element in composition:
+            mw_actual_assumed = float("{:.4f}".format(inputs['molecular weight neutral'] - average_mass + assumed_mass))
+            if mw_actual_assumed == calculated_mass_from_si:
+                molecular_formula_removed = removeElement(composition, element)
+                return comment + f"It appears that the accurate mass was generated by calculating the molecular weight for the neutral molecule {molecular_formula_removed} ({formulaMass(molecular_formula_removed):.4f}) and adding +{assumed_mass:.4f} => {inputs['molecular formula neutral']} ({mw_actual_assumed:.4f}).", "C"
+
+    return rule
+
+def ruleMassMismatch(inputs, comment, errlvl):
+    if inputs['mass error from si'] < inputs['mass error'] - abs(inputs['mass error from si'] < inputs['mass error']) > 1:
+        return comment + "Found mass matches erroneous formula, recheck data and/or look for extraneous or missing atom(s) in the reported molecular formula. ", "A"
+
+def ruleSwappedIntegers(inputs, comment, errlvl):
+    if checkSwappedIntegers(inputs['calculated mass from si'], inputs['found mass from si']):
+        return comment + "The calculated mass and the measured mass appear to be transposed by two digits. ", "D"
+
+def ruleDifferentIntegers(inputs, comment, errlvl):
+    if checkDifferentIntegers(inputs['calculated mass from si'], inputs['found mass from si']):
+        return comment + "The reported and measured accurate masses differ in their integers. ", "D"
+
+def ruleTypo(inputs, comment, errlvl):
+    if checkTypo(inputs['calculated mass from si'], inputs['found mass from si'], inputs['calculated mass']):
+        return comment + "The calculated mass might contain a typo. ", "D"
+
+def ruleBelowFivePpm(inputs, comment, errlvl):
+    if inputs['threshold'] < 5 and inputs['mass error from si'] <= 5 and inputs['mass error'] <= 5:
+        return comment + "Above selected threshold. ", "G"
+
+def ruleErroneousFormula(inputs, comment, errlvl):
+    if inputs['mass error from si'] > inputs['threshold'] or inputs['mass error']:
+        return comment + "Found mass matches erroneous formula, recheck data and/or look for extraneous or missing atom(s) in the reported molecular formula. ", "A"
+
+# composition dictionary -> neutral molecular formula with one atom of element removed
+def removeElement(composition, element):
+    composition = {curr_element: {"count": content['count']} for curr_element, content in composition.items()}
+    composition[element]['count'] = composition[element]['count'] - 1
+    return compositionToFormula(composition, 'neutral')
+
+# assumed (whole number) mass, monoisotopic mass and molecular weight of the ions to check
+ions_to_check = {element: (assumed_mass, Formula(element).monoisotopic_mass, Formula(element).mass)
+                 for element, assumed_mass in (('H', 1), ('Na', 23), ('K', 39))}
+
+# ordered rule table, evaluated top to bottom for every row
+# on hit:
+#     - "stop" = the rule decides the row, no further rules are evaluated
+#     - "continue" = the rule adds to the comment, later rules are still evaluated
+#     - "fallback" = only evaluated while no error level has been set, decides the row
+# needs formula = the rule uses the composition and molecular weights of the row
+classification_rules = [
+    # name, rule, on hit, needs formula
+    ("invalid formula", ruleInvalidFormula, "stop", False),
+    ("invalid input", ruleInvalidInput, "stop", False),
+    ("within threshold", ruleWithinThreshold, "stop", False),
+    ("implausible formula", ruleImplausibleFormula, "continue", True),
+    ("neutral mass", ruleNeutralMass, "continue", False),
+    ("molecular weight neutral", ruleMolecularWeightNeutral, "continue", True),
+    ("molecular weight ion", ruleMolecularWeightIon, "continue", True),
+    ("added H", ruleAddedIon('H'), "continue", True),
+    ("added Na", ruleAddedIon('Na'), "continue", True),
+    ("added K", ruleAddedIon('K'), "continue", True),
+    ("mass mismatch", ruleMassMismatch, "fallback", False),
+    ("swapped integers", ruleSwappedIntegers, "fallback", False),
+    ("different integers", ruleDifferentIntegers, "fallback", False),
+    ("typo", ruleTypo, "fallback", False),
+    ("below 5 ppm", ruleBelowFivePpm, "fallback", False),
+    ("erroneous formula", ruleErroneousFormula, "fallback", False),
+]
+
+# inputs of the rules that only need the extracted row
+def rowInputs(row, threshold, neutral):
+    inputs = {
+        'threshold': threshold,
+        'neutral': neutral,
+        'page number': row['page number'],
+        'extracted text': row['extracted text'],
+        'measuring mode': row['measuring mode'],
+        'molecular ion type': row['molecular ion type'],
+        'molecular formula neutral': row['molecular formula neutral'],
+        'calculated mass from si': row['calculated mass from si'],
+        'found mass from si': row['found mass from si'],
+        'mass error from si': row['mass error from si'],
+    }
+    if inputs['measuring mode'] in ('neutral', 'cation', 'anion'):
+        inputs.update({
+            'molecular formula ion': row['molecular formula ' + row['measuring mode']],
+            'calculated mass from neutral': row['calculated mass from neutral'],
+            'calculated mass': row['calculated mass from ' + row['measuring mode']],
+            'mass error': row['mass error from ' + row['measuring mode']],
+        })
+    return inputs
+
+# inputs of the rules that need the molecular formula to be parsed
+def formulaInputs(inputs):
+    return {
+        'composition': formulaComposition(inputs['molecular formula neutral']),
+        'molecular weight neutral': float("{:.4f}".format(formulaMass(inputs['molecular formula neutral']))),
+        'molecular weight ion': float("{:.4f}".format(formulaMass(inputs['molecular formula ion']))),
+    }
+
+# evaluate the rule table for a single row
+# Input:
+#     - precomputed inputs of the row
+#     - initial comment of the row
+#     - (optional) dictionary that collects the calls, hits and time (s) of every rule
+# Return:
+#     - (comment, error level, name of the rule that decided the row or None)
+#     - the name is "invalid line" if the row could not be evaluated
+def applyRules(inputs, comment, rule_stats=None):
+    errlvl = ""
+    try:
+        for name, rule, on_hit, needs_formula in classification_rules:
+            if on_hit == "fallback" and errlvl != "":
+                break
+            if needs_formula and 'composition' not in inputs:
+                inputs.update(formulaInputs(inputs))
+
+            if rule_stats is None:
+                result = rule(inputs, comment, errlvl)
+            else:
+                start = time.perf_counter()
+                result = rule(inputs, comment, errlvl)
+                stats = rule_stats.setdefault(name, {"calls": 0, "hits": 0, "time": 0.0})
+                stats["calls"] += 1
+                stats["time"] += time.perf_counter() - start
+                if result is not None:
+                    stats["hits"] += 1
+
+            if result is not None:
+                comment, errlvl = result
+                if on_hit != "continue":
+                    return comment, errlvl, name
+    except ValueError as e:
+        print(e)
+        comment = f"On page {inputs['page number']}, found invalid line, '{' '.join(inputs['extracted text'])}'."
+        return comment, errlvl, "invalid line"
+
+    return comment, errlvl, None
+
+
+# candidate molecular formulas for the level-A rows
+# the compositions around the reported formula are enumerated (CHNOPS + halogens) and only those within the
+# threshold of the found mass are kept, pruned by element bounds, the nitrogen rule and ring-plus-double-bond limits
+candidate_elements = ['I', 'Br', 'Cl', 'S', 'P', 'F', 'O', 'N', 'C'] # H is solved for last
+candidate_bounds = {'C': 4, 'H': 8, 'N': 2, 'O': 3, 'P': 1, 'S': 1, 'F': 2, 'Cl': 1, 'Br': 1, 'I': 1} # +/- around the reported count
+candidate_max_rdbe = 40
+candidate_time_cap = 0.5 # s per row
+candidate_count = 3
+valences = {'H': 1, 'C': 4, 'N': 3, 'O': 2, 'P': 3, 'S': 2, 'F': 1, 'Cl': 1, 'Br': 1, 'I': 1,
+            'D': 1, 'Li': 1, 'Na': 1, 'K': 1, 'B': 3, 'Si': 4} # default 2 = no contribution to the rdbe
+electron_mass = ELECTRON.mass
+candidate_masses = {element: Formula(element).monoisotopic_mass for element in candidate_bounds}
+
+# ring-plus-double-bond equivalents of a composition
+def rdbe(composition):
+    return 1 + sum(count * (valences.get(element, 2) - 2) for element, count in composition.items()) / 2
+
+# molecular formula in hill notation
+def hillFormula(composition):
+    elements = [element for element in ('C', 'H') if composition.get(element, 0) > 0]
+    elements += sorted(element for element in composition if element not in ('C', 'H') and composition[element] > 0)
+    return ''.join(element if composition[element] == 1 else f"{element}{composition[element]}" for element in elements)
+
+# Input:
+#     - composition of the reported (neutral) molecular formula, {element: {"count": count}}
+#     - measuring mode
+#     - found mass from si
+#     - threshold in ppm
+#     - (optional) time cap in s, the candidates found until then are returned (default: candidate_time_cap)
+# Return:
+#     - list of (molecular formula, calculated mass, mass error), closest first
+def candidateFormulas(composition, measuring_mode, found_mass, threshold, time_cap=None):
+    if time_cap is None:
+        time_cap = candidate_time_cap
+    deadline = time.perf_counter() + time_cap
+    reported = {element: content['count'] for element, content in composition.items() if element != 'e-'}
+    tolerance = found_mass * threshold * 10 ** -6
+
+    # elements that are not enumerated keep their reported count
+    fixed = {element: count for element, count in reported.items() if element not in candidate_bounds}
+    fixed_mass = sum(count * formulaMonoisotopicMass(element) for element, count in fixed.items())
+    if measuring_mode == 'cation':
+        fixed_mass -= electron_mass
+    elif measuring_mode == 'anion':
+        fixed_mass += electron_mass
+    # nitrogen rule = same electron parity as the reported formula
+    parity = rdbe(reported) % 1
+    reported_formula = hillFormula(reported)
+
+    # mass lattice: the possible counts and masses of every element
+    lattice = {}
+    for element in candidate_bounds:
+        low = max(0, reported.get(element, 0) - candidate_bounds[element])
+        high = reported.get(element, 0) + candidate_bounds[element]
+        lattice[element] = [(count, count * candidate_masses[element]) for count in range(low, high + 1)]
+    # lightest and heaviest mass that the elements after index i can still add
+    min_rest = [0.0] * (len(candidate_elements) + 1)
+    max_rest = [0.0] * (len(candidate_elements) + 1)
+    min_rest[-1] = lattice['H'][0][1]
+    max_rest[-1] = lattice['H'][-1][1]
+    for i in range(len(candidate_elements) - 1, -1, -1):
+        min_rest[i] = min_rest[i + 1] + lattice[candidate_elements[i]][0][1]
+        max_rest[i] = max_rest[i + 1] + lattice[candidate_elements[i]][-1][1]
+
+    candidates = []
+    counts = dict(fixed)
+
+    def search(i, mass):
+        if time.perf_counter() > deadline:
+            return False
+        if i == len(candidate_elements):
+            # solve for H
+            h = round((found_mass - mass) / candidate_masses['H'])
+            if h < lattice['H'][0][0] or h > lattice['H'][-1][0]:
+                return True
+            calculated_mass = mass + h * candidate_masses['H']
+            if abs(calculated_mass - found_mass) > tolerance:
+                return True
+            counts['H'] = h
+            curr_rdbe = rdbe(counts)
+            formula = hillFormula(counts)
+            if curr_rdbe % 1 == parity and -0.5 <= curr_rdbe <= candidate_max_rdbe and formula != reported_formula:
+                candidates.append((formula, float("{:.4f}".format(calculated_mass)), calculateError(found_mass, calculated_mass)))
+            return True
+        element = candidate_elements[i]
+        for count, element_mass in lattice[element]:
+            curr_mass = mass + element_mass
+            if curr_mass + min_rest[i + 1] > found_mass + tolerance:
+                break
+            if curr_mass + max_rest[i + 1] < found_mass - tolerance:
+                continue
+            counts[element] = count
+            if not search(i + 1, curr_mass):
+                return False
+        counts.pop(element, None)
+        return True
+
+    search(0, fixed_mass)
+    candidates.sort(key=lambda candidate: abs(candidate[1] - found_mass))
+    return candidates
+
+# OCR of pages without a text layer (i.e. scanned SIs)
+# the OCR runs in a separate, bounded process pool and only on pages that are image-only
+ocr_dpi = 300
+ocr_cache_size = 1000
+ocr_max_pending = 4 # pages rendered and submitted to the pool at the same time
+ocr_cache = {} # sha256 of the rendered page -> text
+ocr_cache_lock = threading.Lock() # checkFiles runs several checks in threads
+
+# True = the page has no text layer but contains images
+def isImageOnly(page, text):
+    return text.strip() == "" and len(page.get_images()) > 0
+
+# runs in the ocr pool
+# Input:
+#     - png of the rendered page
+# Return:
+#     - text of the page
+def ocrPage(png):
+    ocr_document = fitz.open("pdf", fitz.Pixmap(png).pdfocr_tobytes(language="eng"))
+    text = ocr_document.load_page(0).get_text()
+    ocr_document.close()
+    return text
+
+# store the text of a page in the ocr cache
+def cacheOCR(page_hash, text):
+    with ocr_cache_lock:
+        ocr_cache[page_hash] = text
+        if len(ocr_cache) > ocr_cache_size:
+            del ocr_cache[next(iter(ocr_cache))]
+
+# OCR the image-only pages and cache the results by page-image hash
+# at most ocr_max_pending pages are rendered and waiting in the pool at any time, so the memory of a scanned
+# SI does not grow with its number of pages
+# pages that fail are left empty and not cached, so they are OCR'd again the next time
+# Input:
+#     - pdf document
+#     - page numbers of the image-only pages
+#     - process pool to run the OCR in
+#     - (optional) event that stops the OCR when set, the pages that are not done yet are left empty
+# Return:
+#     - {page number: text}
+def ocrPages(pdf_document, page_nums, ocr_pool, cancelled=None):
+    hashes = {}
+    texts = {} # sha256 -> text of the pages of this document
+    pending = collections.OrderedDict() # sha256 -> future
+
+    def collectOldest():
+        page_hash, future = pending.popitem(last=False)
+        try:
+            texts[page_hash] = future.result()
+        except Exception as e:
+            print("OCR error: ", e)
+            texts[page_hash] = ""
+            return
+        cacheOCR(page_hash, texts[page_hash])
+
+    for page_num in page_nums:
+        if cancelled is not None and cancelled.is_set():
+            break
+        png = pdf_document.load_page(page_num).get_pixmap(dpi=ocr_dpi).tobytes("png")
+        page_hash = hashlib.sha256(png).hexdigest()
+        hashes[page_num] = page_hash
+        if page_hash in texts or page_hash in pending:
+            continue
+        cached = ocr_cache.get(page_hash)
+        if cached is not None:
+            texts[page_hash] = cached
+            continue
+        if len(pending) >= ocr_max_pending:
+            collectOldest()
+        pending[page_hash] = ocr_pool.submit(ocrPage, png)
+        png = None
+
+    while pending:
+        if cancelled is not None and cancelled.is_set():
+            # the pages that have not started are dropped, the running ones are left to finish
+            for future in pending.values():
+                future.cancel()
+            break
+        collectOldest()
+
+    return {page_num: texts.get(page_hash, "") for page_num, page_hash in hashes.items()}
+
+# list that keeps its items in a temporary file instead of in memory (used by the low memory mode)
+# only supports append, len and iteration, which is all the checks need
+class SpillList:
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.length = 0
+
+    def append(self, item):
+        self.file.seek(0, os.SEEK_END)
+        pickle.dump(item, self.file, pickle.HIGHEST_PROTOCOL)
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self.file.seek(0)
+        for i in range(self.length):
+            yield pickle.load(self.file)
+
+    def close(self):
+        self.file.close()
+
+# Input:
+#     - path to the pdf, or the raw bytes of the pdf
+# Return:
+#     - pdf document, or None if the file is not a pdf to check
+def openDocument(filepath):
+    if isinstance(filepath, (bytes, bytearray)):
+        return fitz.open(stream=filepath, filetype="pdf")
+    elif os.path.basename(filepath).lower() == 'desktop.ini':
+        return None
+    else:
+        return fitz.open(filepath)
+
+# extract the text of every page of a pdf
+# Input:
+#     - path to the pdf, or the raw bytes of the pdf
+#     - (optional) process pool to OCR the image-only pages in, these pages stay empty otherwise
+#     - (optional) event that stops the extraction when set, the pages that are not read yet are left out
+# Return:
+#     - list of page strings (index = 0 => page = 1)
+def extractText(filepath, ocr_pool=None, cancelled=None):
+    pdf_document = openDocument(filepath)
+    if pdf_document is None:
+        return []
+    text_content = []
+    image_only_pages = []
+
+    for page_num in range(pdf_document.page_count):
+        if cancelled is not None and cancelled.is_set():
+            break
+        page = pdf_document.load_page(page_num)
+        text_content.append(page.get_text()) # index = 0 => page = 1
+        if ocr_pool is not None and isImageOnly(page, text_content[page_num]):
+            image_only_pages.append(page_num)
+
+    if image_only_pages:
+        for page_num, text in ocrPages(pdf_document, image_only_pages, ocr_pool, cancelled).items():
+            text_content[page_num] = text
+    pdf_document.close()
+    return text_content
+
+# mupdf keeps every object it has parsed until the document is closed, so the document is reopened every so many pages
+reopen_pages = 100
+
+# extract the text of a pdf one page at a time, so only the current page is kept in memory
+# Input:
+#     - path to the pdf, or the raw bytes of the pdf
+#     - (optional) process pool to OCR the image-only pages in, these pages stay empty otherwise
+# Yield:
+#     - page strings in order
+def iterText(filepath, ocr_pool=None):
+    pdf_document = openDocument(filepath)
+    if pdf_document is None:
+        return
+    try:
+        for page_num in range(pdf_document.page_count):
+            if page_num > 0 and page_num % reopen_pages == 0:
+                pdf_document.close()
+                pdf_document = openDocument(filepath)
+            page = pdf_document.load_page(page_num)
+            text = page.get_text()
+            if ocr_pool is not None and isImageOnly(page, text):
+                text = ocrPages(pdf_document, [page_num], ocr_pool)[page_num]
+            # release the page and the resources that mupdf keeps cached for it
+            page = None
+            fitz.TOOLS.store_shrink(100)
+            yield text
+    finally:
+        pdf_document.close()
+
+extracted_columns = ['page number', 'extracted text', 'initial comment', 'molecular ion type',
+                     'molecular formula neutral', 'molecular formula cation', 'molecular formula anion',
+                     'measuring mode', 'sodium', 'calculated mass from si', 'found mass from si',
+                     'calculated mass from neutral', 'calculated mass from cation', 'calculated mass from anion',
+                     'mass error from si', 'mass error from neutral', 'mass error from cation', 'mass error from anion']
+
+# find the hrms data in the pages of a pdf
+# Input:
+#     - list (or iterator) of page strings
+#     - (optional) event that stops the extraction when set
+#     - (optional) True = spill the rows to a temporary file instead of building a pandas df
+# Return:
+#     - pandas df with one row per hrms line (SpillList of row dictionaries in low memory mode), or None if cancelled
+def extractData(file_contents_arr, cancelled=None, low_memory=False):
+    # rows of the extracted data
+    if low_memory:
+        extracted_rows = SpillList()
+    else:
+        extracted_rows = []
+    
+    # line structure to determine where in the line the necessary words are
+    line_structure = { # default structure -- change as needed
+        "molecular formula": 2,
+        "calculated mass from si": 3,
+        "found mass from si": 5,
+        "fixed": False
+    }
+
+    curr_string = "" # to help with any carry-over from the previous page
+    
+    for page_num, page_contents in enumerate(file_contents_arr):
+        if cancelled is not None and cancelled.is_set():
+            if low_memory:
+                extracted_rows.close()
+            return None
+
+        print("page", page_num)
+        file_contents = curr_string.rstrip() + page_contents.lstrip() 
+        # print(file_contents)
+        try:
+            # check if this page contains any hrms data
+            file_contents_removed = re.sub(r'[^a-zA-Z0-9]', '', file_contents)
+
+            if not 'hrms' in file_contents_removed.lower() and not 'calc' in file_contents_removed.lower() and not 'found' in file_contents_removed.lower():
+                raise ValueError('hrms not found on page') # will throw valueerror if not and continue
+
+            # remove short lines
+            lines = file_contents.splitlines()
+            lines = [line if len(line) >= 7 else '\n' for line in lines]
+            file_contents = '\n'.join(lines)
+
+            if curr_string == "HRMS":
+                print("HRMS curstring")
+                print(file_contents)
+            
+            # search for all hrms data in the page
+            curr_index = -1
+            hrms_index = -1
+            while curr_index < len(file_contents):
+                # print(curr_index)
+                # print(curr_index)
+                # print(file_contents[curr_index+1:])
+                hrms_index = file_contents.lower().find("hrms", curr_index+1)
+                curr_index = file_contents.lower().find("cal", curr_index+1)
+                # print(hrms_index)
+                print(curr_index, hrms_index)
+                print(file_contents[curr_index:curr_index+100])
+                
+                if curr_index == -1:
+                    if hrms_index != -1:
+                        # print("hrms index", hrms_index)
+                        new_line_index = file_contents.find('\n', hrms_index)
+                        # print()
+                        curr_string = file_contents[hrms_index:new_line_index]
+                    
+                    print("breaking ?")
+                    break # no more hrms data left on the page
+                # elif curr_index == -1 and hrms_index != -1:
+                    # curr_string = file_contents[len(file_contents)-100:len(file_contents)]
+                    # print(curr_string)
+                    # curr_string = "hrms "
+                    # break
+                    # curr_index = curr_index + 100
+                else:
+                    try:
+                        # check that this line is actually hrms data
+                        start_index = curr_index - 50
+                        end_index = curr_index + 100
+                        if curr_index-50 < 0:
+                            start_index = 0
+                        if curr_index+100 >= len(file_contents):
+                            end_index = len(file_contents)
+                        found_string_test = file_contents[start_index:end_index]
+                        found_string_removed = re.sub(r'[^a-zA-Z0-9]*', '', found_string_test).lower() 
+
+                        # print(found_string_test)
+                        # print(found_string_removed) 
+                        
+                        if ('hrms' in found_string_removed and 'found' in found_string_removed):
+                            print("hrms in found string")
+                            if curr_string != "":
+                                curr_string = ""
+
+                            found_string_removed = re.sub(r'[^a-zA-Z0-9+-\[\]\(\)]*', '', file_contents[start_index:end_index]).lower() 
+                            print(found_string_removed)
+
+                            # determine whether cation/anion/neutral measuring mode
+                            measuring_mode = ""
+                            molecular_ion_type = 'unknown'
+                            sodium = False
+
+                            cation_mit_index = found_string_removed.find(']+', 0)
+                            if cation_mit_index == -1:
+                                found_string_removed.find(')+', 0)
+
+                            anion_mit_index = found_string_removed.find(']-', 0)
+                            if anion_mit_index == -1:
+                                found_string_removed.find(')-', 0)
+
+                            if cation_mit_index != -1 and ((cation_mit_index < anion_mit_index and anion_mit_index != -1) or (anion_mit_index == -1)): 
+                                molecular_ion_type = 'cation'
+                            elif cation_mit_index != -1 and ((anion_mit_index < cation_mit_index and cation_mit_index != -1) or (cation_mit_index == -1)):
+                                molecular_ion_type = 'anion'
+                            else:
+                                molecular_ion_type = 'unknown'
+
+                            # m+h -> cation
+                            # m+ -> cation
+                            # m- -> anion
+                            # m-h -> anion
+
+                            # cation
+                            # m+nh4
+                            # m+Na
+                            # m+k
+
+                            # anion
+                            # m+cl
+                            # m+ch3coo
+
+                            # clean up the found_string
+                            # found_string = re.sub('\n+', '\n', file_contents[curr_index:curr_index+75])
+                            found_string = re.sub(r'\s+', ' ', found_string_test)
+                            # print(found_string)
+                            found_string = re.sub(r'[:;,]', ' ', found_string)
+                            found_string = re.sub(r'[\+-]+', '', found_string)
+                            found_string = re.sub(r'\(.*?\)', '', found_string)
+                            found_string = re.sub(r'\[.*?\]', '', found_string)
+                            # print(found_string)
+                            found_string = re.sub(r'h\s*r\s*m\s*s', 'hrms', found_string, flags=re.IGNORECASE)
+
+                            found_string = found_string.replace('[M+Na]+', '')
+                            found_string = found_string.replace('Na]+', '')
+                            found_string = found_string.replace('(M+Na)+', '')
+                            found_string = found_string.replace('(M + Na)+', '')
+                            found_string = found_string.replace('[M+H]+', '')
+                            found_string = found_string.replace('[M-H]+', '')
+                            found_string = found_string.replace('[M+H]', '')
+                            found_string = found_string.replace('[M]', '')
+                            found_string = found_string.replace('[M + H]+', '')
+                            found_string = found_string.replace('[M - H]+', '')
+                            found_string = found_string.replace('m/z', '')
+                            found_string = found_string.replace('m/s', '')
+                            found_string = found_string.replace('(M+H)+', '')
+                            found_string = found_string.replace('(M + H)+', '')
+                            found_string = found_string.replace('[]', '')
+                            found_string = found_string.replace('[M', '')
+                            found_string = found_string.replace('H]+', '')
+
+                            found_string = re.sub(r'(\s+)(\d+).(\s+)(\d+)(\s+)', r'\1\2.\4\5', found_string)
+                            found_string = re.sub(r'\d+[\+\-–]', '', found_string)
+
+                            # tokenize the found string
+                            str_split = re.split(r'\s+', found_string)
+                            str_split = [curr_str for curr_str in str_split if len(curr_str) > 1]
+
+                            # print(str_split)
+
+                            for i in range(len(str_split)):
+                                if 'hrms' in re.sub(r'[^a-zA-Z0-9]*', '', str_split[i]).lower():
+                                    # print("hrms found at", i)
+                                    str_split = str_split[i:]
+                                    str_split[0] = 'hrms'
+                                    break
+                            
+                            # print(str_split)
+
+                            # establish line_structure for the first instance to find where 
+                            # molecular formula, calculated mass from si, and found mass from si are in the tokenized string
+                            between_hrms_found = 0
+                            if not line_structure['fixed']:
+                                for i in range(len(str_split)):
+                                    # print(i, str_split[i])
+                                    if between_hrms_found == 0 and 'hrms' in re.sub(r'[^a-zA-Z0-9]*', '', str_split[i]).lower():
+                                        between_hrms_found = between_hrms_found + 1
+                                    elif between_hrms_found == 1 and str_split[i].lower() == 'found':
+                                        between_hrms_found = between_hrms_found + 1
+                                        line_structure.update({'found mass from si': i+1})
+                                    if between_hrms_found == 1:
+                                        try:
+                                            calculated_mass_from_si = str_split[i]
+                                            calculated_mass_from_si = calculated_mass_from_si.rstrip('.')
+                                            # print(calculated_mass_from_si)
+                                            calculated_mass_from_si = float(calculated_mass_from_si)
+
+                                            line_structure.update({'calculated mass from si': i})
+                                        except:
+                                            # continue
+                                            pass
+                                        
+                                        try:
+                                            mass = float("{:.4f}".format(formulaMonoisotopicMass(str_split[i])))
+                                            line_structure.update({'molecular formula': i})
+                                        except:
+                                            # continue     
+                                            pass
+                                line_structure.update({'fixed': True})
+                                print(line_structure)
+                            if len(str_split) < line_structure['found mass from si']: # if the found_string is cut off, continue to next page
+                                curr_string = found_string
+                            elif not re.search(r'\d', str_split[0]):
+                                print(str_split)
+
+                                molecular_formula = re.sub(r'\W+', '', str_split[line_structure['molecular formula']]).rstrip('+-.[]')
+                                molecular_formula_cation = '[' + molecular_formula.rstrip('.+[]') + ']+'
+                                molecular_formula_anion = '[' + molecular_formula.rstrip('.-+[]') + ']-'
+                                
+                                # remove any . after the masses
+                                calculated_mass_from_si = str_split[line_structure['calculated mass from si']]
+                                calculated_mass_from_si = calculated_mass_from_si.rstrip('.')
+                                calculated_mass_from_si = float("{:.4f}".format(float(calculated_mass_from_si)))
+
+                                found_mass_from_si = str_split[line_structure['found mass from si']]
+                                found_mass_from_si = found_mass_from_si.rstrip('.')
+                                found_mass_from_si = float("{:.4f}".format(float(found_mass_from_si)))
+                                
+                                # calculate the masses based on the molecular formula
+                                calculated_mass_from_neutral = float("{:.4f}".format(formulaMonoisotopicMass(molecular_formula)))
+                                calculated_mass_from_cation = float("{:.4f}".format(formulaMonoisotopicMass(molecular_formula_cation)))
+                                calculated_mass_from_anion = float("{:.4f}".format(formulaMonoisotopicMass(molecular_formula_anion)))
+
+                                # determine measuring mode here:
+                                initial_comment = ""
+                                # molecular_ion_type = ""
+                                if calculated_mass_from_neutral == calculated_mass_from_si: # neutral mode
+                                    # molecular_ion_type = "neutral"
+                                    measuring_mode = "neutral"
+                                elif calculated_mass_from_cation == calculated_mass_from_si: # cation mode
+                                    # molecular_ion_type = "cation"
+                                    measuring_mode = "cation"
+                                elif calculated_mass_from_anion == calculated_mass_from_si: # anion mode
+                                    # molecular_ion_type = "anion"
+                                    measuring_mode = "anion"
+                                else:
+                                    # molecular_ion_type = "unknown"
+                                    measuring_mode = "cation"
+
+
+                                extracted_rows.append(dict(zip(extracted_columns, [page_num+1, found_string, initial_comment, molecular_ion_type, molecular_formula, molecular_formula_cation, molecular_formula_anion, 
+                                                                        measuring_mode, sodium, calculated_mass_from_si, found_mass_from_si, 
+                                                                        calculated_mass_from_neutral, calculated_mass_from_cation, calculated_mass_from_anion, 
+                                                                        calculateError(found_mass_from_si, calculated_mass_from_si), 
+                                                                        calculateError(found_mass_from_si, calculated_mass_from_neutral), calculateError(found_mass_from_si, calculated_mass_from_cation), calculateError(found_mass_from_si, calculated_mass_from_anion)])))
+                            curr_index += 100
+                    except (ValueError, FormulaError) as e:
+                        match e:
+                            case ValueError():
+                                print("val error")
+                                extracted_rows.append(dict(zip(extracted_columns, [page_num+1, str_split, 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A', 'N/A'])))
+                            case FormulaError():
+                                print("formula error")
+                                # print(str_split)
+                                calculated_mass_from_si = str_split[line_structure['calculated mass from si']]
+                                calculated_mass_from_si = calculated_mass_from_si.rstrip('.')
+                                calculated_mass_from_si = float("{:.4f}".format(float(calculated_mass_from_si)))
+
+                                found_mass_from_si = str_split[line_structure['found mass from si']]
+                                found_mass_from_si = found_mass_from_si.rstrip('.')
+                                found_mass_from_si = float("{:.4f}".format(float(found_mass_from_si)))
+
+                                extracted_rows.append(dict(zip(extracted_columns, [page_num+1, str_split, -1, molecular_ion_type, str_split[line_structure['molecular formula']], -1, -1, 
+                                    -1, -1, calculated_mass_from_si, found_mass_from_si, 
+                                    -1, -1, -1, 
+                                    calculateError(found_mass_from_si, calculated_mass_from_si), 
+                                    -1, -1, -1])))
+
+                        
+                        # print(e)
+                        curr_index += 100
+                        continue
+                
+
+        except ValueError as e: # on this page, there is no hrms data
+            continue
+
+    if low_memory:
+        return extracted_rows
+    # pandas df to hold the extracted data
+    return pd.DataFrame(extracted_rows, columns=extracted_columns, dtype=object)
+
+# assign the error levels and comments to the extracted hrms data
+# Input:
+#     - pandas df (or SpillList of row dictionaries) from extractData
+#     - threshold in ppm
+#     - True = the neutral mass is expected to be reported
+#     - (optional) event that stops the classification when set
+#     - (optional) dictionary that collects the calls, hits and time (s) of every classification rule
+#     - (optional) list (or SpillList) to append the entries of file_request to
+# Return:
+#     - (file_request, total_examples, incorrect_examples, invalid_inputs), or None if cancelled
+def classifyData(extracted_data, threshold, neutral, cancelled=None, rule_stats=None, file_request=None):
+    if file_request is None:
+        file_request = []
+    if isinstance(extracted_data, pd.DataFrame):
+        rows = (row for index, row in extracted_data.iterrows())
+    else:
+        rows = extracted_data
+    total_examples = 0
+    incorrect_examples = [0, 0, 0, 0] # indices: 0 = worst, 1 = fixable, 2 = minor
+    invalid_inputs = 0
+
+    print(len(extracted_data))
+    # for every entry in the pandas df
+    for row in rows: # page number = row['page number']
+        if cancelled is not None and cancelled.is_set():
+            return None
+
+        comment = row['initial comment']
+
+        total_examples = total_examples + 1
+
+        inputs = rowInputs(row, threshold, neutral)
+        comment, errlvl, decided_by = applyRules(inputs, comment, rule_stats)
+        if errlvl == "A" and candidate_time_cap > 0:
+            if 'composition' not in inputs:
+                inputs.update(formulaInputs(inputs))
+            candidates = candidateFormulas(inputs['composition'], inputs['measuring mode'], inputs['found mass from si'], threshold, time_cap=candidate_time_cap)
+            if candidates:
+                comment += "Candidate molecular formula(s) within the selected threshold of the found mass: "
+                comment += ', '.join(f"{formula} ({mass:.4f}, {error} ppm)" for formula, mass, error in candidates[:candidate_count]) + ". "
+        if decided_by == "invalid input":
+            invalid_inputs += 1
+        elif decided_by != "invalid line":
+            if errlvl == "A":
+                incorrect_examples[0] = incorrect_examples[0] + 1
+            elif errlvl == "F":
+                incorrect_examples[2] = incorrect_examples[2] + 1
+            elif errlvl == "G":
+                incorrect_examples[3] = incorrect_examples[3] + 1
+            elif errlvl != "":
+                incorrect_examples[1] = incorrect_examples[1] + 1
+
+        # determine error level 
+        if row['measuring mode'] != -1 and row['measuring mode'] != 'N/A':
+            file_request.append({
+                "molform": row['molecular formula neutral'],
+                "pg": row['page number'],
+                "iontype": row['molecular ion type'],
+                "errlvl": errlvl,
+                "errms": row['mass error from si'],
+                "errcalc": row['mass error from ' + row['measuring mode']],
+                "sicalc": row['calculated mass from si'],
+                "sifound": row['found mass from si'],
+                "recalc": row['calculated mass from ' + row['measuring mode']],
+                "com": comment
+            })
+        elif row['measuring mode'] == 'N/A':
+            file_request.append({
+                "molform": 'N/A',
+                "pg": row['page number'],
+                "iontype": 'N/A',
+                "errlvl": 'N/A',
+                "errms": 'N/A',
+                "errcalc": 'N/A',
+                "sicalc": 'N/A',
+                "sifound": 'N/A',
+                "recalc": 'N/A',
+                "com": comment
+            })
+        else:
+            # print(errlvl)
+            # determine if invalid formula is a POTENTIAL or KNOWN error ?
+
+            if row['mass error from si'] != -1:
+                err_ms = row['mass error from si']
+            else:
+                err_ms = "N/A"
+
+            file_request.append({
+                "molform": row['molecular formula neutral'],
+                "pg": row['page number'],
+                "iontype": row['molecular ion type'],
+                "errlvl": errlvl,
+                "errms": err_ms,
+                "errcalc": "N/A",
+                "sicalc": row['calculated mass from si'],
+                "sifound": row['found mass from si'],
+                "recalc": "N/A",
+                "com": comment
+            })
+
+    return file_request, total_examples, incorrect_examples, invalid_inputs
+
+# run the full check on a single pdf
+# Input:
+#     - path to the pdf, or the raw bytes of the pdf
+#     - threshold in ppm
+#     - True = the neutral mass is expected to be reported
+#     - (optional) event that stops the check when set
+#     - (optional) dictionary that collects the calls, hits and time (s) of every classification rule
+#     - (optional) process pool to OCR the image-only pages in
+#     - (optional) True = low memory mode, see below
+#     - (optional) list to append the entries of file_request to while they are classified
+# Return:
+#     - dictionary that is written to the output json, or None if cancelled
+#
+# Low memory mode bounds the memory of a check independently of the number of pages:
+#     - the pages are read one at a time, so only the current page (and the carry-over of the previous one) is kept
+#     - the extracted rows and the entries of file_request are spilled to temporary files
+#       (file_request is a SpillList, write it with writeJSON and close it afterwards)
+#     - the mupdf cache is released after every page, and the pdf document is reopened every reopen_pages pages
+#       and closed after the last one
+def checkFile(filepath, threshold, neutral, cancelled=None, rule_stats=None, ocr_pool=None, low_memory=False, file_request=None):
+    if low_memory:
+        file_contents_arr = iterText(filepath, ocr_pool)
+    else:
+        file_contents_arr = extractText(filepath, ocr_pool, cancelled)
+    file_json = checkPages(file_contents_arr, filepath, threshold, neutral, cancelled, rule_stats, low_memory, file_request)
+    if low_memory:
+        file_contents_arr.close() # releases the pdf if the check was cancelled
+    return file_json
+
+# check the text of a file, the part of checkFile after the text extraction
+# Input:
+#     - list (or iterator) of page strings
+#     - path to the pdf (None or bytes if there is no path)
+#     - threshold, neutral, cancelled, rule_stats, low_memory and file_request as in checkFile
+# Return:
+#     - dictionary that is written to the output json, or None if cancelled
+def checkPages(file_contents_arr, filepath, threshold, neutral, cancelled=None, rule_stats=None, low_memory=False, file_request=None):
+    title = "title"
+
+    extracted_data = extractData(file_contents_arr, cancelled, low_memory)
+    if extracted_data is None:
+        return None
+    own_file_request = file_request is None and low_memory
+    if own_file_request:
+        file_request = SpillList()
+    classified_data = classifyData(extracted_data, threshold, neutral, cancelled, rule_stats, file_request)
+    if low_memory:
+        extracted_data.close()
+    if classified_data is None:
+        if own_file_request:
+            file_request.close()
+        return None
+    file_request, total_examples, incorrect_examples, invalid_inputs = classified_data
+
+    return {
+        "Title": title,
+        "filepath": filepath if isinstance(filepath, str) else None,
+        "Date": date.today().isoformat(),
+        "threshold": threshold,
+        "total": total_examples,
+        "aerrors": incorrect_examples[0],
+        "bgerrors": incorrect_examples[1],
+        "herrors": incorrect_examples[2],
+        "ierrors": incorrect_examples[3],
+        "invalidInputs": invalid_inputs,
+        "file_request": file_request
+    }
+
+# write the dictionary from checkFile to the output json
+# same as json.dumps(file_json, indent=3), but the entries of file_request are written one at a time
+def writeJSON(file_json, outputJSONFile):
+    header = json.dumps({key: value for key, value in file_json.items() if key != "file_request"}, indent=3)
+    outputJSONFile.write(header[:-2] + ',\n   "file_request": [')
+    for i, entry in enumerate(file_json["file_request"]):
+        outputJSONFile.write(('\n' if i == 0 else ',\n') + textwrap.indent(json.dumps(entry, indent=3), ' ' * 6))
+    if len(file_json["file_request"]) > 0:
+        outputJSONFile.write('\n   ')
+    outputJSONFile.write(']\n}')
+
+# indexed store of the results (sqlite), so the results of many files can be queried without re-reading the json
+# every checked file is a row in files, every entry of its file_request a row in results
+store_schema = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL,
+    filepath TEXT,
+    title TEXT,
+    date TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    neutral INTEGER NOT NULL,
+    total INTEGER,
+    aerrors INTEGER,
+    bgerrors INTEGER,
+    herrors INTEGER,
+    ierrors INTEGER,
+    invalid_inputs INTEGER,
+    UNIQUE (hash, threshold, neutral, date)
+);
+CREATE TABLE IF NOT EXISTS results (
+    file_id INTEGER NOT NULL REFERENCES files (id) ON DELETE CASCADE,
+    row_index INTEGER NOT NULL,
+    molform TEXT,
+    pg INTEGER,
+    iontype TEXT,
+    errlvl TEXT,
+    errms,
+    errcalc,
+    sicalc,
+    sifound,
+    recalc,
+    com TEXT,
+    PRIMARY KEY (file_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash);
+CREATE INDEX IF NOT EXISTS files_date ON files (date);
+CREATE INDEX IF NOT EXISTS results_errlvl ON results (errlvl);
+CREATE INDEX IF NOT EXISTS results_molform ON results (molform);
+CREATE INDEX IF NOT EXISTS results_pg ON results (pg);
+"""
+result_keys = ["molform", "pg", "iontype", "errlvl", "errms", "errcalc", "sicalc", "sifound", "recalc", "com"]
+
+def openStore(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(store_schema)
+    if "neutral" not in [column[1] for column in connection.execute("PRAGMA table_info(files)")]:
+        connection.close()
+        raise ValueError(f"{path} was created without the neutral column, create a new store")
+    return connection
+
+# sha256 of a pdf, given as a path or as raw bytes
+def fileHash(filepath):
+    if isinstance(filepath, (bytes, bytearray)):
+        return hashlib.sha256(filepath).hexdigest()
+    file_hash = hashlib.sha256()
+    with open(filepath, 'rb') as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(1 << 20), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+# add the dictionary from checkFile to the store, replacing the results of the same file, threshold, neutral and date
+# Input:
+#     - path of the store
+#     - dictionary from checkFile
+#     - sha256 of the pdf
+#     - True = the file was checked with the neutral mass expected to be reported
+def storeFileJSON(path, file_json, file_hash, neutral):
+    connection = openStore(path)
+    with connection:
+        connection.execute("DELETE FROM files WHERE hash = ? AND threshold = ? AND neutral = ? AND date = ?",
+                           (file_hash, file_json["threshold"], int(neutral), file_json["Date"]))
+        file_id = connection.execute(
+            "INSERT INTO files (hash, filepath, title, date, threshold, neutral, total, aerrors, bgerrors, herrors, ierrors, invalid_inputs) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_hash, file_json["filepath"], file_json["Title"], file_json["Date"], file_json["threshold"], int(neutral), file_json["total"],
+             file_json["aerrors"], file_json["bgerrors"], file_json["herrors"], file_json["ierrors"], file_json["invalidInputs"])).lastrowid
+        connection.executemany(
+            "INSERT INTO results (file_id, row_index, molform, pg, iontype, errlvl, errms, errcalc, sicalc, sifound, recalc, com) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((file_id, row_index) + tuple(entry[key] for key in result_keys) for row_index, entry in enumerate(file_json["file_request"])))
+    connection.close()
+
+# Input:
+#     - path of the store
+#     - (optional) filters, None = any:
+#         - error level, molecular formula, page, sha256 of the pdf, date (yyyy-mm-dd), neutral (True/False)
+#         - text that the comment contains
+# Return:
+#     - list of file_request entries, each with the filepath, hash, date, threshold and neutral of its file
+def queryStore(path, errlvl=None, molform=None, pg=None, file_hash=None, date=None, comment=None, neutral=None):
+    conditions = []
+    parameters = []
+    for column, value in (("results.errlvl", errlvl), ("results.molform", molform), ("results.pg", pg),
+                          ("files.hash", file_hash), ("files.date", date),
+                          ("files.neutral", None if neutral is None else int(neutral))):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            parameters.append(value)
+    if comment is not None:
+        # % and _ typed by the user are matched literally
+        conditions.append("results.com LIKE ? ESCAPE '\\'")
+        parameters.append("%" + comment.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+    query = ("SELECT files.filepath, files.hash, files.date, files.threshold, files.neutral, " + ", ".join("results." + key for key in result_keys) +
+             " FROM results JOIN files ON files.id = results.file_id")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY files.date, files.filepath, results.row_index"
+
+    connection = openStore(path)
+    rows = connection.execute(query, parameters).fetchall()
+    connection.close()
+    entries = [dict(zip(["filepath", "hash", "date", "threshold", "neutral"] + result_keys, row)) for row in rows]
+    for entry in entries:
+        entry["neutral"] = bool(entry["neutral"])
+    return entries
+
+# when you query the store, python 'filepath' query store_path [--errlvl=C] [--molform=...] [--pg=...] [--hash=...] [--date=...] [--neutral=0|1] [--comment=...]
+# prints the matching entries as json
+query_filters = {"errlvl": "errlvl", "molform": "molform", "pg": "pg", "hash": "file_hash", "date": "date",
+                 "neutral": "neutral", "comment": "comment"} # option -> argument of queryStore
+def queryMain(argv):
+    try:
+        if len(argv) < 3 or argv[2].startswith('--'):
+            raise ValueError("no store given, python check-amm.py query store_path [--filter=value ...]")
+        filters = {}
+        for arg in argv[3:]:
+            name, equals, value = arg.partition('=')
+            if not name.startswith('--') or name[2:] not in query_filters:
+                raise ValueError(f"unknown filter {arg}, the filters are " + ", ".join(f"--{name}=..." for name in query_filters))
+            if not equals:
+                raise ValueError(f"no value given for {arg}, use {arg}=...")
+            name = name[2:]
+            if name == "pg":
+                if not value.isdigit():
+                    raise ValueError(f"--pg must be a page number, not {value!r}")
+                value = int(value)
+            elif name == "neutral":
+                if value not in ('0', '1'):
+                    raise ValueError(f"--neutral must be 0 or 1, not {value!r}")
+                value = value == '1'
+            filters[query_filters[name]] = value
+        entries = queryStore(argv[2], **filters)
+    except Exception as e:
+        print("Error: ", e)
+        return
+    print(json.dumps(entries, indent=3))
+
+# list that also hands every appended entry to an asyncio queue, so checkFiles can stream the rows of a file
+# while it is being classified in another thread
+class StreamedList(list):
+    def __init__(self, loop, queue):
+        super().__init__()
+        self.loop = loop
+        self.queue = queue
+
+    def append(self, item):
+        super().append(item)
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+process_window = 2 * (os.cpu_count() or 1) # files submitted to a process executor at the same time
+
+# asynchronous version of the check for web backends
+# the extraction and classification of every file run in an executor so the event loop stays free
+# Input:
+#     - list of paths to pdfs and/or raw bytes of pdfs
+#     - threshold in ppm
+#     - True = the neutral mass is expected to be reported
+#     - (optional) executor to run the checks in, the default executor of the loop (threads) is used otherwise
+#       a ProcessPoolExecutor checks process_window files at a time in parallel, and can share the formula cache
+#       with initializer=openFormulaCache, initargs=(path,)
+#     - (optional) process pool to OCR the image-only pages in (only with a thread executor)
+# Yield:
+#     - {"event": "row", "file": index, "row": entry of file_request} for every row of a file
+#     - {"event": "file", "file": index, "result": dictionary from checkFile} once a file is done
+#     - {"event": "error", "file": index, "error": message} if a file could not be checked
+# With a thread executor the files are checked one after the other, and the rows are yielded as soon as they are
+# classified. With a process executor the files are yielded in the order they finish, and the rows of a file only
+# once the whole file is done. The events of a file are never mixed with the events of another file.
+# Cancelling the task that consumes the iterator (i.e. the user leaves) or closing the iterator stops a check
+# running in a thread at the next page/row (a check running in another process runs to completion), and no
+# further files are started.
+async def checkFiles(paths_or_bytes, threshold, neutral, executor=None, ocr_pool=None):
+    loop = asyncio.get_running_loop()
+
+    if isinstance(executor, ProcessPoolExecutor):
+        # events and queues cannot be sent to other processes
+        files = enumerate(paths_or_bytes)
+        pending = {} # future -> index of the file
+        try:
+            while True:
+                for file_index, filepath in itertools.islice(files, process_window - len(pending)):
+                    pending[loop.run_in_executor(executor, checkFile, filepath, threshold, neutral)] = file_index
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in sorted(done, key=pending.get):
+                    file_index = pending.pop(future)
+                    try:
+                        file_json = future.result()
+                    except Exception as e:
+                        yield {"event": "error", "file": file_index, "error": str(e)}
+                        continue
+                    for row in file_json["file_request"]:
+                        yield {"event": "row", "file": file_index, "row": row}
+                    yield {"event": "file", "file": file_index, "result": file_json}
+        finally:
+            # the files that have not started yet are dropped
+            for future in pending:
+                future.cancel()
+        return
+
+    for file_index, filepath in enumerate(paths_or_bytes):
+        cancelled = threading.Event()
+        queue = asyncio.Queue()
+        file_request = StreamedList(loop, queue)
+
+        future = loop.run_in_executor(executor, checkFile, filepath, threshold, neutral, cancelled, None, ocr_pool, False, file_request)
+        try:
+            # None marks the end of the file, it is queued after all the rows
+            future.add_done_callback(lambda future, queue=queue: queue.put_nowait(None))
+            while True:
+                row = await queue.get()
+                if row is None:
+                    break
+                yield {"event": "row", "file": file_index, "row": row}
+
+            try:
+                file_json = await future
+            except Exception as e:
+                yield {"event": "error", "file": file_index, "error": str(e)}
+                continue
+        finally:
+            if not future.done():
+                cancelled.set()
+
+        yield {"event": "file", "file": file_index, "result": file_json}
+
+def main(argv):
+    if len(argv) > 1 and argv[1] == 'query':
+        return queryMain(argv)
+
+    # when you run the program, python 'filepath' threshold number_of_files output_filepath fiilepaths ...
+    # options:
+    #     --ocr[=workers] = OCR the image-only pages in a pool of workers (default 2, needs Tesseract)
+    #     --low-memory = keep the memory flat in the number of pages, see checkFile
+    #     --formula-cache=path = share parsed formulas with other processes and later runs through this file
+    #     --store=path = also add the results to an indexed sqlite store, see queryStore
+    options = [arg for arg in argv[1:] if arg.startswith('--')]
+    argv = [arg for arg in argv if not arg.startswith('--')]
+
+    ocr_pool = None
+    low_memory = '--low-memory' in options
+    formula_cache_path = None
+    store_path = None
+    for option in options:
+        if option.startswith('--store='):
+            store_path = option.partition('=')[2]
+        if option.startswith('--formula-cache='):
+            formula_cache_path = option.partition('=')[2]
+            warmFormulaCache(formula_cache_path)
+        if option == '--ocr' or option.startswith('--ocr='):
+            ocr_workers = int(option.partition('=')[2] or 2)
+            ocr_pool = ProcessPoolExecutor(max_workers=ocr_workers)
+
+    threshold = float(argv[1])
+    numfiles = int(argv[2])
+    outfile = argv[3]
+    filepaths = [None] * numfiles
+    neutral = argv[4]
+    if neutral == '0':
+        neutral = False
+    elif neutral == '1':
+        neutral = True
+    for i in range(numfiles):
+        filepaths[i] = argv[i+5]
+
+    outputJSONFile = open(outfile, 'w')
+
+    for filepath in filepaths:
+        try:
+            file_json = checkFile(filepath, threshold, neutral, ocr_pool=ocr_pool, low_memory=low_memory)
+        except Exception as e:
+            print("Error: ", e)
+            continue
+
+        # convert the data into json format + write the json data into a file
+        # the file will be read by the server later to generate the table
+        writeJSON(file_json, outputJSONFile)
+        outputJSONFile.write("qwqwqw\n")
+        if store_path is not None:
+            # the output json is already written, a store that cannot be written does not stop the other files
+            try:
+                storeFileJSON(store_path, file_json, fileHash(filepath), neutral)
+            except Exception as e:
+                print("Error: ", e)
+        if low_memory:
+            file_json["file_request"].close()
+
+    outputJSONFile.close()
+    if formula_cache_path is not None:
+        saveFormulaCache(formula_cache_path)
+    if ocr_pool is not None:
+        ocr_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
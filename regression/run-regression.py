@@ -0,0 +1,334 @@
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# golden-output regression runner for check_amm.py
+# the corpus holds the text of SIs (pages separated by form feeds), so runs skip the pdf parsing, together with
+# the expected output (file_request and totals) for every threshold/neutral configuration
+# the first configuration is also run through checkPages and writeJSON and compared byte for byte with
+# <name>.out.json, the expected output json (written with json.dumps, with a fixed date)
+#
+# when you run the regression, python regression/run-regression.py [options]
+# options:
+#     --update = rewrite the expected outputs from the current code
+#     --add file.pdf ... = extract the text of pdfs into the corpus and write their expected outputs
+#     --low-memory = run the checks in low memory mode
+#     --workers=N = number of processes (default: number of cpus)
+# the calls, hits and time of every classification rule over the whole corpus are printed after the fixtures,
+# together with the rules that no fixture hits (their output is not covered by the expected outputs)
+# the output of the example SI is also added to a temporary sqlite store with neutral off and on, twice each
+# (the second run replaces the first), and the queries are compared with the expected outputs
+# the async api (checkFiles) is also run on the example SI, with threads and with processes (which map a warmed
+# formula cache with initializer=openFormulaCache)
+# exits with 1 if any output differs from the expected one
+
+regression_dir = os.path.dirname(os.path.abspath(__file__))
+corpus_dir = os.path.join(regression_dir, 'corpus')
+configurations = [ # threshold, neutral
+    (3.0, False),
+    (3.0, True),
+    (1.0, False),
+    (10.0, False),
+]
+max_differences = 20 # per fixture
+golden_date = "2000-01-01" # Date of the expected output json
+
+example_path = os.path.join(regression_dir, '..', 'examples', 'example_SI.pdf')
+
+sys.path.insert(0, os.path.join(regression_dir, '..'))
+import check_amm
+
+
+def fixturePaths(name):
+    return os.path.join(corpus_dir, name + '.txt'), os.path.join(corpus_dir, name + '.json')
+
+def outputPath(name):
+    return os.path.join(corpus_dir, name + '.out.json')
+
+# extract the text of a pdf into the corpus
+# Return:
+#     - name of the fixture
+def addFixture(filepath):
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    text_path, expected_path = fixturePaths(name)
+    with open(text_path, 'w', encoding='utf-8') as text_file:
+        text_file.write('\f'.join(check_amm.extractText(filepath)))
+    return name
+
+# runs in the process pool
+# Input:
+#     - name of the fixture
+#     - True = low memory mode
+# Return:
+#     - (name, list of outputs per configuration, {stage: time in s}, output json written by writeJSON,
+#        the same output json written by json.dumps, {rule: {"calls", "hits", "time"}})
+def runFixture(name, low_memory):
+    timings = {"load": 0.0, "extract": 0.0, "classify": 0.0, "write": 0.0}
+    rule_stats = {}
+    outputs = []
+
+    start = time.perf_counter()
+    text_path, expected_path = fixturePaths(name)
+    with open(text_path, encoding='utf-8') as text_file:
+        pages = text_file.read().split('\f')
+    timings["load"] += time.perf_counter() - start
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for threshold, neutral in configurations:
+            start = time.perf_counter()
+            extracted_data = check_amm.extractData(iter(pages), low_memory=low_memory)
+            timings["extract"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            file_request = check_amm.SpillList() if low_memory else None
+            file_request, total_examples, incorrect_examples, invalid_inputs = check_amm.classifyData(
+                extracted_data, threshold, neutral, rule_stats=rule_stats, file_request=file_request)
+            timings["classify"] += time.perf_counter() - start
+
+            outputs.append({
+                "threshold": threshold,
+                "neutral": neutral,
+                "total": total_examples,
+                "aerrors": incorrect_examples[0],
+                "bgerrors": incorrect_examples[1],
+                "herrors": incorrect_examples[2],
+                "ierrors": incorrect_examples[3],
+                "invalidInputs": invalid_inputs,
+                "file_request": list(file_request)
+            })
+            if low_memory:
+                extracted_data.close()
+                file_request.close()
+
+        # the output json of the first configuration, as check-amm.py writes it
+        threshold, neutral = configurations[0]
+        file_json = check_amm.checkPages(iter(pages), name + '.pdf', threshold, neutral, low_memory=low_memory)
+        file_json["Date"] = golden_date
+
+    start = time.perf_counter()
+    output_file = io.StringIO()
+    check_amm.writeJSON(file_json, output_file)
+    timings["write"] += time.perf_counter() - start
+    dumped = json.dumps({**file_json, "file_request": list(file_json["file_request"])}, indent=3)
+    if low_memory:
+        file_json["file_request"].close()
+
+    # round trip through json so the outputs compare like the written ones
+    return name, json.loads(json.dumps(outputs)), timings, output_file.getvalue(), dumped, rule_stats
+
+# Return:
+#     - list of differences between the expected and the actual outputs
+def diffOutputs(expected, actual):
+    differences = []
+    if len(expected) != len(actual):
+        return [f"{len(expected)} configurations expected, {len(actual)} found"]
+    for expected_output, actual_output in zip(expected, actual):
+        configuration = f"threshold {actual_output['threshold']}, neutral {actual_output['neutral']}"
+        for key in expected_output:
+            if key != "file_request" and expected_output[key] != actual_output.get(key):
+                differences.append(f"{configuration}: {key} {expected_output[key]!r} -> {actual_output.get(key)!r}")
+
+        expected_rows = expected_output["file_request"]
+        actual_rows = actual_output["file_request"]
+        if len(expected_rows) != len(actual_rows):
+            differences.append(f"{configuration}: {len(expected_rows)} rows expected, {len(actual_rows)} found")
+        for row_index, (expected_row, actual_row) in enumerate(zip(expected_rows, actual_rows)):
+            for key in expected_row:
+                if expected_row[key] != actual_row.get(key):
+                    differences.append(f"{configuration}, row {row_index} (page {expected_row['pg']}): {key} {expected_row[key]!r} -> {actual_row.get(key)!r}")
+    return differences
+
+# runs in the process pool
+def formulaCacheMapped():
+    return check_amm.shared_formula_cache is not None
+
+# check that checkFiles yields the expected rows of the example SI for the first configuration
+# Return:
+#     - list of differences per executor
+async def checkAsyncAPI(executor):
+    threshold, neutral = configurations[0]
+    rows = []
+    result = None
+    async for event in check_amm.checkFiles([example_path], threshold, neutral, executor=executor):
+        if event["event"] == "row":
+            rows.append(event["row"])
+        elif event["event"] == "file":
+            result = event["result"]
+        else:
+            return [f"error: {event['error']}"]
+    if result is None:
+        return ["no file event"]
+
+    text_path, expected_path = fixturePaths('example_SI')
+    with open(expected_path, encoding='utf-8') as expected_file:
+        expected = json.load(expected_file)[:1]
+    actual = [{"threshold": threshold, "neutral": neutral, **{key: value for key, value in result.items() if key in expected[0]}}]
+    actual[0]["file_request"] = rows
+    return diffOutputs(expected, json.loads(json.dumps(actual)))
+
+# store the output of a fixture for the first two configurations (neutral off and on) and query it back
+# Input:
+#     - name of the fixture
+#     - path of the (new) store
+# Return:
+#     - list of differences between the expected and the stored outputs
+def checkStore(name, store_path):
+    text_path, expected_path = fixturePaths(name)
+    with open(text_path, encoding='utf-8') as text_file:
+        pages = text_file.read().split('\f')
+    with open(expected_path, encoding='utf-8') as expected_file:
+        expected = {(output["threshold"], output["neutral"]): output for output in json.load(expected_file)}
+    file_hash = check_amm.fileHash(pages[0].encode('utf-8'))
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for threshold, neutral in configurations[:2]:
+            for run in range(2): # the second run replaces the results of the first
+                file_json = check_amm.checkPages(iter(pages), name + '.pdf', threshold, neutral)
+                check_amm.storeFileJSON(store_path, file_json, file_hash, neutral)
+
+    differences = []
+    def compare(query, expected_rows, **filters):
+        rows = [{key: row[key] for key in check_amm.result_keys} for row in query(**filters)]
+        if json.loads(json.dumps(rows)) != expected_rows:
+            differences.append(f"query {filters}: {len(expected_rows)} rows expected, {len(rows)} found" if len(rows) != len(expected_rows)
+                               else f"query {filters}: rows differ")
+
+    for threshold, neutral in configurations[:2]:
+        expected_rows = expected[(threshold, neutral)]["file_request"]
+        query = lambda **filters: check_amm.queryStore(store_path, neutral=neutral, **filters)
+        compare(query, expected_rows)
+        for errlvl in sorted({row["errlvl"] for row in expected_rows}):
+            compare(query, [row for row in expected_rows if row["errlvl"] == errlvl], errlvl=errlvl)
+        for pg in sorted({row["pg"] for row in expected_rows}):
+            compare(query, [row for row in expected_rows if row["pg"] == pg], pg=pg)
+    if len(check_amm.queryStore(store_path)) != sum(len(expected[configuration]["file_request"]) for configuration in configurations[:2]):
+        differences.append("the second run did not replace the first")
+    if any('%' not in row["com"] for row in check_amm.queryStore(store_path, comment='%')):
+        differences.append("comment % was matched as a wildcard")
+
+    # the command line reports bad filters instead of raising
+    for arg in ("--bogus=1", "--pg=abc", "--neutral=2", "--pg"):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            check_amm.queryMain(['check-amm.py', 'query', store_path, arg])
+        if not output.getvalue().startswith("Error: "):
+            differences.append(f"query {arg}: no error reported")
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        check_amm.queryMain(['check-amm.py', 'query', store_path, '--neutral=1', '--errlvl=C'])
+    if json.loads(output.getvalue()) != json.loads(json.dumps(check_amm.queryStore(store_path, neutral=True, errlvl='C'))):
+        differences.append("query --neutral=1 --errlvl=C: output differs from queryStore")
+    return differences
+
+
+def main(argv):
+    options = [arg for arg in argv[1:] if arg.startswith('--')]
+    arguments = [arg for arg in argv[1:] if not arg.startswith('--')]
+
+    update = '--update' in options
+    low_memory = '--low-memory' in options
+    workers = None
+    for option in options:
+        if option.startswith('--workers='):
+            workers = int(option.partition('=')[2])
+
+    added = []
+    if '--add' in options:
+        for filepath in arguments:
+            added.append(addFixture(filepath))
+
+    names = sorted(os.path.splitext(filename)[0] for filename in os.listdir(corpus_dir) if filename.endswith('.txt'))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(runFixture, names, [low_memory] * len(names)))
+    wall_time = time.perf_counter() - start
+
+    failed = False
+    print(f"{'fixture':<30} {'load (s)':>9} {'extract (s)':>12} {'classify (s)':>13} {'write (s)':>10}  result")
+    for name, outputs, timings, written, dumped, rule_stats in results:
+        text_path, expected_path = fixturePaths(name)
+        if update or name in added or not os.path.exists(expected_path) or not os.path.exists(outputPath(name)):
+            with open(expected_path, 'w', encoding='utf-8') as expected_file:
+                json.dump(outputs, expected_file, indent=3)
+                expected_file.write('\n')
+            with open(outputPath(name), 'w', encoding='utf-8', newline='') as output_file:
+                output_file.write(dumped)
+            result = "written"
+            differences = []
+        else:
+            with open(expected_path, encoding='utf-8') as expected_file:
+                differences = diffOutputs(json.load(expected_file), outputs)
+            with open(outputPath(name), encoding='utf-8', newline='') as output_file:
+                expected_output = output_file.read()
+            if written != expected_output:
+                offset = next((i for i, (a, b) in enumerate(zip(expected_output, written)) if a != b),
+                              min(len(expected_output), len(written)))
+                differences.append(f"output json differs from {os.path.basename(outputPath(name))} at character {offset}: "
+                                   f"{expected_output[offset:offset + 40]!r} -> {written[offset:offset + 40]!r}")
+            result = "ok" if not differences else f"{len(differences)} difference(s)"
+            failed = failed or len(differences) > 0
+
+        print(f"{name:<30} {timings['load']:>9.3f} {timings['extract']:>12.3f} {timings['classify']:>13.3f} {timings['write']:>10.3f}  {result}")
+        for difference in differences[:max_differences]:
+            print("    " + difference)
+        if len(differences) > max_differences:
+            print(f"    ... {len(differences) - max_differences} more")
+
+    print(f"{len(names)} fixture(s) in {wall_time:.2f} s")
+
+    # rule statistics of the whole corpus, in the order of the rule table
+    total_stats = {name: {"calls": 0, "hits": 0, "time": 0.0} for name, rule, on_hit, needs_formula in check_amm.classification_rules}
+    for result in results:
+        for name, stats in result[5].items():
+            for key in total_stats[name]:
+                total_stats[name][key] += stats[key]
+    print()
+    print(f"{'rule':<30} {'calls':>9} {'hits':>9} {'time (ms)':>10}")
+    for name, stats in total_stats.items():
+        print(f"{name:<30} {stats['calls']:>9} {stats['hits']:>9} {stats['time'] * 1000:>10.3f}")
+    not_hit = [name for name, stats in total_stats.items() if stats["hits"] == 0]
+    if not_hit:
+        print("not hit by the corpus: " + ", ".join(not_hit))
+    print()
+
+    if 'example_SI' in names and not update:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            start = time.perf_counter()
+            differences = checkStore('example_SI', os.path.join(tmpdir, 'results.sqlite'))
+            result = "ok" if not differences else f"{len(differences)} difference(s)"
+            print(f"{'store and query':<26} {time.perf_counter() - start:.2f} s  {result}")
+            for difference in differences[:max_differences]:
+                print("    " + difference)
+            failed = failed or len(differences) > 0
+
+            formula_cache_path = os.path.join(tmpdir, 'formulas.cache')
+            check_amm.warmFormulaCache(formula_cache_path)
+            executors = (
+                ("threads", lambda: ThreadPoolExecutor(max_workers=2)),
+                ("processes", lambda: ProcessPoolExecutor(max_workers=2, initializer=check_amm.openFormulaCache,
+                                                          initargs=(formula_cache_path,))),
+            )
+            for executor_name, makeExecutor in executors:
+                start = time.perf_counter()
+                with makeExecutor() as executor, open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                    differences = asyncio.run(checkAsyncAPI(executor))
+                    if executor_name == "processes" and not executor.submit(formulaCacheMapped).result():
+                        differences.append("formula cache not mapped in the workers")
+                result = "ok" if not differences else f"{len(differences)} difference(s)"
+                print(f"checkFiles with {executor_name:<10} {time.perf_counter() - start:.2f} s  {result}")
+                for difference in differences[:max_differences]:
+                    print("    " + difference)
+                failed = failed or len(differences) > 0
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))